@@ -434,6 +434,9 @@ class AlgorithmConfig(_Config):
         self.input_read_method_kwargs = {}
         self.prelearner_module_synch_period = 10
         self.dataset_num_iters_per_learner = None
+        self.dataset_local_shuffle_buffer_size = None
+        self.dataset_prefetch_queue_depth = 2
+        self.dataset_obs_dtype = None
         self.input_config = {}
         self.actions_in_input_normalized = False
         self.postprocess_inputs = False
@@ -2384,6 +2387,9 @@ class AlgorithmConfig(_Config):
         input_read_method_kwargs=NotProvided,
         prelearner_module_synch_period=NotProvided,
         dataset_num_iters_per_learner=NotProvided,
+        dataset_local_shuffle_buffer_size=NotProvided,
+        dataset_prefetch_queue_depth=NotProvided,
+        dataset_obs_dtype=NotProvided,
         input_config=NotProvided,
         actions_in_input_normalized=NotProvided,
         input_evaluation=NotProvided,
@@ -2420,11 +2426,37 @@ class AlgorithmConfig(_Config):
                 higher this value the more off-policy the `PreLearner`'s module will be.
                 Values too small will force the `PreLearner` to sync a ,lot with the
                 `Learner` and will slow down the data pipeline. The default value chosen
-                by the `OfflinePreLearner` is 10.
+                by the `OfflinePreLearner` is 10. Note, this periodic sync is not
+                functional, yet: `PreLearner`s keep the module state their (cached)
+                data pipeline was built with. Until the sync works, call
+                `OfflineData.clear_iterator_cache()` after a weight update to force
+                the next `sample` call to rebuild its pipeline with fresh weights.
             dataset_num_iters_per_learner: Number of iterations to run in each learner
                 during a single training iteration. If `None`, each learner runs a
                 complete epoch over its data block (the dataset is partitioned into
                 as many blocks as there are learners). The default is `None`.
+            dataset_local_shuffle_buffer_size: The size of the local shuffle buffer
+                used when iterating over the offline dataset. If `None` (default),
+                no local shuffling is applied and the data is only shuffled via
+                randomizing the block order at read time. Note, the block order is
+                randomized only once, i.e. with the default of `None` every epoch
+                over the dataset replays the identical row order; set a buffer size
+                here, if per-epoch reshuffling of rows is needed. Note further,
+                large buffer sizes can degrade iteration throughput considerably as
+                the buffer has to be filled (and copied) before batches can be
+                returned.
+            dataset_prefetch_queue_depth: The maximum number of preprocessed
+                batches to prefetch in the background when sampling single
+                batches from the offline dataset. A background thread pulls
+                batches from the dataset iterator into a queue of this depth,
+                such that the `PreLearner`'s preprocessing overlaps with the
+                `Learner`'s update. The default is 2.
+            dataset_obs_dtype: An optional NumPy dtype (e.g. "float16") to
+                downcast float observation columns to right after reading the
+                offline dataset. This halves (or quarters) the bytes moved
+                through the data pipeline for FP64/FP32 observations at the
+                cost of precision; the model upcasts again inside its forward
+                pass. If `None` (default), observations are left untouched.
             input_config: Arguments that describe the settings for reading the inpu t.
                 If input is `sample`, this will be environment configuation, e.g.
                 `env_name` and `env_config`, etc. See `EnvContext` for more info.
@@ -2471,6 +2503,25 @@ class AlgorithmConfig(_Config):
             self.prelearner_module_synch_period = prelearner_module_synch_period
         if dataset_num_iters_per_learner is not NotProvided:
             self.dataset_num_iters_per_learner = dataset_num_iters_per_learner
+        if dataset_local_shuffle_buffer_size is not NotProvided:
+            self.dataset_local_shuffle_buffer_size = dataset_local_shuffle_buffer_size
+        if dataset_prefetch_queue_depth is not NotProvided:
+            self.dataset_prefetch_queue_depth = dataset_prefetch_queue_depth
+        if dataset_obs_dtype is not NotProvided:
+            # Validate here, such that an invalid dtype raises loudly instead
+            # of getting swallowed by the dataset read error handling in
+            # `OfflineData.__init__` (which would silently skip the cast).
+            if dataset_obs_dtype is not None:
+                import numpy as np
+
+                try:
+                    np.dtype(dataset_obs_dtype)
+                except TypeError as e:
+                    raise ValueError(
+                        f"`dataset_obs_dtype` ({dataset_obs_dtype}) is not a "
+                        f"valid NumPy dtype: {e}"
+                    )
+            self.dataset_obs_dtype = dataset_obs_dtype
         if input_config is not NotProvided:
             if not isinstance(input_config, dict):
                 raise ValueError(
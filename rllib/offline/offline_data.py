@@ -1,7 +1,14 @@
 import logging
 import numpy as np
 from pathlib import Path
+import queue
 import random
+import threading
+
+import functools
+
+import gymnasium as gym
+
 import ray
 from ray.actor import ActorHandle
 from typing import Any, Dict, List, Optional, Union
@@ -12,6 +19,7 @@ from ray.rllib.core.columns import Columns
 from ray.rllib.core.learner import Learner
 from ray.rllib.core.rl_module.marl_module import MultiAgentRLModuleSpec
 from ray.rllib.env.single_agent_episode import SingleAgentEpisode
+from ray.rllib.env.utils.infinite_lookback_buffer import InfiniteLookbackBuffer
 from ray.rllib.policy.sample_batch import MultiAgentBatch, SampleBatch
 from ray.rllib.utils.compression import unpack_if_needed
 from ray.rllib.utils.typing import EpisodeType, ModuleID
@@ -38,17 +46,44 @@ SCHEMA = [
     "unroll_id",
 ]
 
+# Frozen set for fast O(1) membership tests when filtering out the
+# extra model output columns from a batch.
+_SCHEMA_SET = frozenset(SCHEMA)
+
+# Shared reward space for the episodes built in `_map_to_episodes`. Passing
+# this single instance into each episode's reward buffer avoids allocating a
+# new `gym.spaces.Box` (incl. its RNG setup) per row.
+_REWARD_SPACE = gym.spaces.Box(float("-inf"), float("inf"), (), np.float32)
+
+
+def _cast_obs_columns(
+    batch: Dict[str, np.ndarray], dtype: np.dtype
+) -> Dict[str, np.ndarray]:
+    """Downcasts the float observation columns of a batch to `dtype`.
+
+    Non-float columns (e.g. LZ4-compressed object columns or integer
+    observations) are passed through unchanged.
+    """
+    return {
+        k: v.astype(dtype)
+        if (
+            k in (Columns.OBS, Columns.NEXT_OBS)
+            and isinstance(v, np.ndarray)
+            and v.dtype.kind == "f"
+            and v.dtype != dtype
+        )
+        else v
+        for k, v in batch.items()
+    }
+
 
 class OfflineData:
     def __init__(self, config: AlgorithmConfig):
 
         self.config = config
         self.is_multi_agent = config.is_multi_agent()
-        self.path = (
-            config.get("input_")
-            if isinstance(config.get("input_"), list)
-            else Path(config.get("input_"))
-        )
+        input_ = config.get("input_")
+        self.path = input_ if isinstance(input_, list) else Path(input_)
         # Use `read_json` as default data read method.
         self.data_read_method = config.input_read_method
         # Override default arguments for the data read method.
@@ -60,12 +95,42 @@ class OfflineData:
             self.data = getattr(ray.data, self.data_read_method)(
                 self.path, **self.data_read_method_kwargs
             )
+            # Shuffle cheaply via the block order. Local shuffle buffers are
+            # opt-in (see `dataset_local_shuffle_buffer_size`) as they degrade
+            # iteration throughput considerably.
+            self.data = self.data.randomize_block_order()
+            # If requested, downcast float observations right at ingest time to
+            # cut the bytes moved through the rest of the pipeline.
+            if config.dataset_obs_dtype is not None:
+                self.data = self.data.map_batches(
+                    functools.partial(
+                        _cast_obs_columns,
+                        dtype=np.dtype(config.dataset_obs_dtype),
+                    ),
+                    batch_format="numpy",
+                    zero_copy_batch=True,
+                )
             logger.info("Reading data from {}".format(self.path))
             logger.info(self.data.schema())
         except Exception as e:
             logger.error(e)
-        # Avoids reinstantiating the batch iterator each time we sample.
-        self.batch_iterator = None
+        self.local_shuffle_buffer_size = config.dataset_local_shuffle_buffer_size
+        if self.local_shuffle_buffer_size:
+            logger.warning(
+                "Using a local shuffle buffer of size "
+                f"{self.local_shuffle_buffer_size}. Large buffers can slow down "
+                "iteration over the dataset significantly. Prefer shuffling via "
+                "the (already applied) block-order randomization, if possible."
+            )
+        # Avoids reinstantiating batch iterators each time we sample. Note, the
+        # iterators depend on the batch size (and, for the multi-shard path,
+        # the shard count and locality hints), so we cache them by these keys
+        # instead of trashing them whenever the batch size changes.
+        self._iter_cache: Dict[tuple, Any] = {}
+        # Background prefetching of preprocessed batches (single-batch path).
+        # The queue depth bounds how far the `PreLearner`s can run ahead of
+        # the `Learner`.
+        self.prefetch_queue_depth = config.dataset_prefetch_queue_depth
         # For remote learner setups.
         self.locality_hints = None
         self.learner_handles = None
@@ -77,18 +142,66 @@ class OfflineData:
         return_iterator: bool = False,
         num_shards: int = 1,
     ):
-        if (
-            not return_iterator
-            or return_iterator
-            and num_shards <= 1
-            and not self.batch_iterator
-        ):
-            # If no iterator should be returned, or if we want to return a single
-            # batch iterator, we instantiate the batch iterator once, here.
-            # TODO (simon, sven): The iterator depends on the `num_samples`, i.e.abs
-            # sampling later with a different batch size would need a
-            # reinstantiation of the iterator.
-            self.batch_iterator = self.data.map_batches(
+        # In case of multiple shards, we return multiple
+        # `StreamingSplitIterator` instances.
+        if return_iterator and num_shards > 1:
+            # Re-running `streaming_split` re-plans the whole pipeline and
+            # restarts the `PreLearner` actors, so cache the split iterators
+            # and reuse them across calls as well.
+            key = (num_samples, num_shards, tuple(self.locality_hints or ()))
+            if key in self._iter_cache:
+                return self._iter_cache[key]
+            # Call here the learner to get an up-to-date module state.
+            # TODO (simon): This is a workaround as along as learners cannot
+            # receive any calls from another actor.
+            # Note, we pass the state along as an `ObjectRef` (no `ray.get`
+            # here), such that it is serialized into the object store exactly
+            # once and all `PreLearner` actors resolve it from there (via
+            # shared memory for same-node actors), instead of Ray Data
+            # shipping a full copy into every actor's constructor.
+            # For GB-scale modules even this single plasma copy per node
+            # becomes the bottleneck; the plan is then to host per-node relay
+            # actors that receive the state once (ideally via an RDMA-capable
+            # transport, once available in Ray core) and serve `PreLearner`s
+            # locally. Not needed at current module sizes.
+            # Note further, since the split pipeline is cached, the state is
+            # only fetched when the pipeline is (re)built. Until the periodic
+            # in-actor sync in `OfflinePreLearner` becomes functional, callers
+            # must invalidate via `clear_iterator_cache` after weight updates
+            # to get fresh weights into the `PreLearner`s.
+            module_state = self.learner_handles[0].get_state.remote(
+                component=COMPONENT_RL_MODULE
+            )
+            self._iter_cache[key] = self.data.map_batches(
+                # TODO (cheng su): At best the learner handle passed in here should
+                # be the one from the learner that is nearest, but here we cannot
+                # provide locality hints.
+                OfflinePreLearner,
+                fn_constructor_kwargs={
+                    "config": self.config,
+                    "learner": self.learner_handles,
+                    "locality_hints": self.locality_hints,
+                    "module_spec": self.module_spec,
+                    "module_state": module_state,
+                },
+                concurrency=num_shards,
+                batch_size=num_samples,
+                # See the single-shard path below: the `OfflinePreLearner`
+                # expects a dict of NumPy arrays.
+                batch_format="numpy",
+                zero_copy_batch=True,
+            ).streaming_split(
+                n=num_shards, equal=False, locality_hints=self.locality_hints
+            )
+            return self._iter_cache[key]
+
+        # Otherwise, we sample from a single cached batch iterator. The iterator
+        # (and its prefetch queue) only depends on the batch size (`num_shards`
+        # plays no role in this pipeline), so it is cached by `num_samples` and
+        # reused across calls.
+        key = num_samples
+        if key not in self._iter_cache:
+            batch_iterator = self.data.map_batches(
                 OfflinePreLearner,
                 fn_constructor_kwargs={
                     "config": self.config,
@@ -96,50 +209,79 @@ class OfflineData:
                 },
                 concurrency=2,
                 batch_size=num_samples,
+                # The `OfflinePreLearner` expects a dict of NumPy arrays. Pinning
+                # the format avoids a pandas materialization of each batch and
+                # lets Arrow-backed columns come through zero-copy.
+                batch_format="numpy",
+                # The `OfflinePreLearner` only reads the batch, so we can pass
+                # it zero-copy and avoid a defensive copy per batch.
+                zero_copy_batch=True,
             ).iter_batches(
                 batch_size=num_samples,
                 prefetch_batches=2,
-                local_shuffle_buffer_size=num_samples * 10,
+                local_shuffle_buffer_size=self.local_shuffle_buffer_size,
             )
+            # Note, the prefetch queue/thread is only created lazily below, on
+            # the first single-batch `sample` call for this key. Callers that
+            # only want the iterator itself must not trigger a concurrent
+            # background epoch over the same pipeline.
+            self._iter_cache[key] = [batch_iterator, None]
 
+        batch_iterator, prefetch_queue = self._iter_cache[key]
         # Do we want to return an iterator or a single batch?
         if return_iterator:
-            # In case of multiple shards, we return multiple
-            # `StreamingSplitIterator` instances.
-            if num_shards > 1:
-                # Call here the learner to get an up-to-date module state.
-                # TODO (simon): This is a workaround as along as learners cannot
-                # receive any calls from another actor.
-                module_state = ray.get(
-                    self.learner_handles[0].get_state.remote(
-                        component=COMPONENT_RL_MODULE
-                    )
-                )
-                return self.data.map_batches(
-                    # TODO (cheng su): At best the learner handle passed in here should
-                    # be the one from the learner that is nearest, but here we cannot
-                    # provide locality hints.
-                    OfflinePreLearner,
-                    fn_constructor_kwargs={
-                        "config": self.config,
-                        "learner": self.learner_handles,
-                        "locality_hints": self.locality_hints,
-                        "module_spec": self.module_spec,
-                        "module_state": module_state,
-                    },
-                    concurrency=num_shards,
-                    batch_size=num_samples,
-                    zero_copy_batch=True,
-                ).streaming_split(
-                    n=num_shards, equal=False, locality_hints=self.locality_hints
-                )
+            return batch_iterator
 
-            # Otherwise, we return a simple batch `DataIterator`.
-            else:
-                return self.batch_iterator
-        else:
-            # Return a single batch from the iterator.
-            return next(iter(self.batch_iterator))["batch"][0]
+        # Pull preprocessed batches into a small queue in the background,
+        # so the `PreLearner`'s connector pipeline overlaps with the
+        # `Learner`'s update instead of running serially with it.
+        if prefetch_queue is None:
+            prefetch_queue = queue.Queue(maxsize=self.prefetch_queue_depth)
+            prefetch_thread = threading.Thread(
+                target=self._prefetch_batches,
+                args=(batch_iterator, prefetch_queue),
+                daemon=True,
+            )
+            prefetch_thread.start()
+            self._iter_cache[key][1] = prefetch_queue
+
+        # Return a single batch from the prefetch queue.
+        batch = prefetch_queue.get()
+        # Re-raise in the caller, if the prefetch thread died. Evict the dead
+        # pipeline from the cache, such that the next call rebuilds it instead
+        # of blocking forever on its (never again filled) queue.
+        if isinstance(batch, Exception):
+            del self._iter_cache[key]
+            raise batch
+        return batch["batch"][0]
+
+    def clear_iterator_cache(self) -> None:
+        """Drops all cached batch and streaming-split iterators.
+
+        The multi-shard pipelines are built with a snapshot of the learner's
+        module state (see `sample`) and the periodic in-actor sync of the
+        `PreLearner` modules is not functional, yet. Call this after a weight
+        update to force the next `sample` call to rebuild its pipeline with a
+        fresh module state. Note, prefetch threads of dropped single-batch
+        pipelines are daemons and simply idle on their full queues.
+        """
+        self._iter_cache.clear()
+
+    @staticmethod
+    def _prefetch_batches(batch_iterator, prefetch_queue) -> None:
+        """Fills the prefetch queue with batches from the batch iterator.
+
+        Runs in a background thread. Note, `iter_batches` returns a
+        re-iterable, i.e. when an epoch over the dataset is exhausted, we
+        simply start the next one.
+        """
+        try:
+            while True:
+                for batch in batch_iterator:
+                    prefetch_queue.put(batch)
+        except Exception as e:
+            # Hand the error over to the consumer in `sample`.
+            prefetch_queue.put(e)
 
     @property
     def default_read_method_kwargs(self):
@@ -155,7 +297,7 @@ class OfflinePreLearner:
         learner: Union[Learner, list[ActorHandle]],
         locality_hints: Optional[list] = None,
         module_spec: Optional[MultiAgentRLModuleSpec] = None,
-        module_state: Optional[Dict[ModuleID, Any]] = None,
+        module_state: Optional[Union[Dict[ModuleID, Any], ray.ObjectRef]] = None,
     ):
 
         self.config = config
@@ -188,6 +330,11 @@ class OfflinePreLearner:
             self.learner_is_remote = True
             # Build the module from spec. Note, this will be a MARL module.
             self._module = module_spec.build()
+            # The module state may come in as an `ObjectRef` (see
+            # `OfflineData.sample`), in which case all `PreLearner`s share a
+            # single object-store copy. Resolve it here once.
+            if isinstance(module_state, ray.ObjectRef):
+                module_state = ray.get(module_state)
             self._module.set_state(module_state)
         # Build the learner connector pipeline.
         self._learner_connector = self.config.build_learner_connector(
@@ -196,19 +343,42 @@ class OfflinePreLearner:
         )
         # Cache the policies to be trained to update weights only for these.
         self._policies_to_train = self.config.policies_to_train
+        # For the (common) non-callable case, precompute a frozenset, such that
+        # `_should_module_be_updated` does not rebuild a set per membership
+        # check.
+        self._policies_to_train_set = (
+            frozenset(self._policies_to_train)
+            if self._policies_to_train and not callable(self._policies_to_train)
+            else None
+        )
         self._is_multi_agent = config.is_multi_agent()
+        # The dataset schema is fixed across batches; it gets resolved once
+        # from the first batch seen in `__call__` and reused afterwards.
+        self._batch_schema = None
         # Set the counter to zero.
         self.iter_since_last_module_update = 0
         # self._future = None
 
     def __call__(self, batch: Dict[str, np.ndarray]) -> Dict[str, List[EpisodeType]]:
+        # Resolve the dataset schema from the first batch only and reuse it
+        # for all subsequent calls.
+        if self._batch_schema is None:
+            self._batch_schema = self._resolve_schema(batch)
         # Map the batch to episodes.
-        episodes = self._map_to_episodes(self._is_multi_agent, batch)
+        episodes = self._map_to_episodes(
+            self._is_multi_agent, batch, schema=self._batch_schema
+        )["episodes"]
         # TODO (simon): Make synching work. Right now this becomes blocking or never
         # receives weights. Learners appear to be non accessable via other actors.
         # Increase the counter for updating the module.
         # IDEA: put the module state into the object store. From there any actor has
         # access.
+        # Also, when re-enabling this, do not broadcast the full dense state on
+        # every sync: keep a baseline copy of the weights on the `Learner` and
+        # ship only the sparse delta against that baseline (changed indices +
+        # values, downcast to a 16-bit float format), plus a periodic full sync
+        # every N deltas. Network bytes per sync then scale with the delta's
+        # sparsity instead of the module size.
         # self.iter_since_last_module_update += 1
 
         # if self._future:
@@ -237,30 +407,38 @@ class OfflinePreLearner:
         batch = self._learner_connector(
             rl_module=self._module,
             data={},
-            episodes=episodes["episodes"],
+            episodes=episodes,
             shared_data={},
         )
-        # Convert to `MultiAgentBatch`.
+        # Convert to `MultiAgentBatch`. Note, each episode built by
+        # `_map_to_episodes` holds exactly one transition, so the overall
+        # env-step count is simply the number of episodes - no need for a
+        # second pass calling `env_steps()` on each of them.
+        # Leave out all data from modules that should not be trained already at
+        # construction time. We do not want to build (and pass around) more data
+        # than necessary. Note, at this point no `MultiAgentBatch` exists, yet,
+        # so a callable `policies_to_train` receives `None` as the batch.
         batch = MultiAgentBatch(
             {
                 module_id: SampleBatch(module_data)
                 for module_id, module_data in batch.items()
+                if self._should_module_be_updated(module_id, None)
             },
-            # TODO (simon): This can be run once for the batch and the
-            # metrics, but we run it twice: here and later in the learner.
-            env_steps=sum(e.env_steps() for e in episodes["episodes"]),
+            env_steps=len(episodes),
         )
-        # Remove all data from modules that should not be trained. We do
-        # not want to pass around more data than necessaty.
-        for module_id in list(batch.policy_batches.keys()):
-            if not self._should_module_be_updated(module_id, batch):
-                del batch.policy_batches[module_id]
 
         # TODO (simon): Log steps trained for metrics (how?). At best in learner
         # and not here. But we could precompute metrics here and pass it to the learner
         # for logging. Like this we do not have to pass around episode lists.
 
         # TODO (simon): episodes are only needed for logging here.
+        # Note, wrapping the `MultiAgentBatch` into a single-element list makes
+        # Ray Data box it into an object-dtype column (and consumers unbox it
+        # again via `["batch"][0]`), which is per-step overhead. Returning flat
+        # Arrow-native columns instead does not work here, though: the
+        # connector output is one dict of columns per `ModuleID`, and the
+        # per-module row counts (and nested tensor shapes) generally differ,
+        # which an Arrow table cannot express.
         return {"batch": [batch]}
 
     def _should_module_be_updated(self, module_id, multi_agent_batch=None):
@@ -269,30 +447,103 @@ class OfflinePreLearner:
             # In case of no update information, the module is updated.
             return True
         elif not callable(self._policies_to_train):
-            return module_id in set(self._policies_to_train)
+            return module_id in self._policies_to_train_set
         else:
             return self._policies_to_train(module_id, multi_agent_batch)
 
+    @staticmethod
+    def _resolve_schema(batch: Dict[str, np.ndarray]) -> Dict[str, Any]:
+        """Resolves batch-independent schema decisions from a first batch.
+
+        Which columns are present (and under which old-/new-stack name), which
+        keys hold extra model outputs and whether the observation columns need
+        unpacking only depends on the dataset schema, which is fixed across
+        batches. Resolve these decisions here once and pass the result into
+        `_map_to_episodes` for every batch of the same dataset.
+        """
+        obs_col = batch[Columns.OBS]
+        next_obs_col = batch[Columns.NEXT_OBS]
+        return {
+            "agent_id_key": (
+                Columns.AGENT_ID
+                if Columns.AGENT_ID in batch
+                # The old stack uses "agent_index" instead of "agent_id".
+                # TODO (simon): Remove this as soon as we are new stack only.
+                else ("agent_index" if "agent_index" in batch else None)
+            ),
+            "has_infos": Columns.INFOS in batch,
+            "terminateds_key": (
+                Columns.TERMINATEDS
+                if Columns.TERMINATEDS in batch
+                # The old stack uses "dones" instead of "terminateds".
+                # TODO (simon): Remove this as soon as we are new stack only.
+                else "dones"
+            ),
+            "has_truncateds": Columns.TRUNCATEDS in batch,
+            # The extra model output columns, i.e. all non-schema keys.
+            "extra_keys": [k for k in batch if k not in _SCHEMA_SET],
+            # Compressed observations only ever show up as object arrays (LZ4
+            # bytes/str payloads). For plain numeric columns, the per-element
+            # `unpack_if_needed` type dispatch can be skipped entirely.
+            "obs_needs_unpack": (
+                not isinstance(obs_col, np.ndarray) or obs_col.dtype == object
+            ),
+            "next_obs_needs_unpack": (
+                not isinstance(next_obs_col, np.ndarray)
+                or next_obs_col.dtype == object
+            ),
+        }
+
     @staticmethod
     def _map_to_episodes(
-        is_multi_agent: bool, batch: Dict[str, np.ndarray]
+        is_multi_agent: bool,
+        batch: Dict[str, np.ndarray],
+        schema: Optional[Dict[str, Any]] = None,
     ) -> Dict[str, List[EpisodeType]]:
-        """Maps a batch of data to episodes."""
+        """Maps a batch of data to episodes.
+
+        Note, `batch` may be passed in zero-copy (see `zero_copy_batch=True` in
+        `OfflineData.sample`), i.e. its arrays could be read-only. This method
+        must therefore never mutate any of the batch's columns in-place.
+
+        If `schema` is None, the schema decisions are resolved from the given
+        batch via `_resolve_schema`. Callers mapping many batches of the same
+        dataset (see `__call__`) should resolve the schema once and pass it in.
+        """
+
+        # This loop runs for every row of every batch on every `PreLearner` and is
+        # therefore interpreter-bound. Hoist all per-column dict lookups (and the
+        # `Columns.AGENT_ID` membership test) out of the row loop and index plain
+        # locals inside of it.
+        # Note, lowering this loop into a compiled (Cython/numba) helper does not
+        # pay off: its runtime is dominated by constructing the Python
+        # `SingleAgentEpisode` objects themselves, which a compiled caller would
+        # still have to do through the interpreter. Keep it pure Python.
+        if schema is None:
+            schema = OfflinePreLearner._resolve_schema(batch)
+
+        obs_col = batch[Columns.OBS]
+        next_obs_col = batch[Columns.NEXT_OBS]
+        actions_col = batch[Columns.ACTIONS]
+        rewards_col = batch[Columns.REWARDS]
+        eps_id_col = batch[Columns.EPS_ID]
+        agent_id_key = schema["agent_id_key"]
+        agent_id_col = batch[agent_id_key] if agent_id_key else None
+        infos_col = batch[Columns.INFOS] if schema["has_infos"] else None
+        terminateds_col = batch[schema["terminateds_key"]]
+        truncateds_col = batch[Columns.TRUNCATEDS] if schema["has_truncateds"] else None
+        extra_cols = [(k, batch[k]) for k in schema["extra_keys"]]
+        obs_needs_unpack = schema["obs_needs_unpack"]
+        next_obs_needs_unpack = schema["next_obs_needs_unpack"]
 
         episodes = []
         # TODO (simon): Give users possibility to provide a custom schema.
-        for i, obs in enumerate(batch["obs"]):
+        for i in range(len(obs_col)):
 
             # If multi-agent we need to extract the agent ID.
             # TODO (simon): Check, what happens with the module ID.
-            if is_multi_agent:
-                agent_id = (
-                    batch[Columns.AGENT_ID][i]
-                    if Columns.AGENT_ID in batch
-                    # The old stack uses "agent_index" instead of "agent_id".
-                    # TODO (simon): Remove this as soon as we are new stack only.
-                    else (batch["agent_index"][i] if "agent_index" in batch else None)
-                )
+            if is_multi_agent and agent_id_col is not None:
+                agent_id = agent_id_col[i]
             else:
                 agent_id = None
 
@@ -301,31 +552,43 @@ class OfflinePreLearner:
                 pass
             else:
                 # Build a single-agent episode with a single row of the batch.
+                # Note, we pass in pre-built `InfiniteLookbackBuffer`s, such
+                # that the episode constructor does not have to re-wrap the
+                # per-row lists (and, in the rewards case, allocate a fresh
+                # `gym.spaces.Box` per row).
                 episode = SingleAgentEpisode(
-                    id_=batch[Columns.EPS_ID][i],
+                    id_=eps_id_col[i],
                     agent_id=agent_id,
-                    observations=[
-                        unpack_if_needed(obs),
-                        unpack_if_needed(batch[Columns.NEXT_OBS][i]),
-                    ],
-                    infos=[
-                        {},
-                        batch[Columns.INFOS][i] if Columns.INFOS in batch else {},
-                    ],
-                    actions=[batch[Columns.ACTIONS][i]],
-                    rewards=[batch[Columns.REWARDS][i]],
-                    terminated=batch[
-                        Columns.TERMINATEDS if Columns.TERMINATEDS in batch else "dones"
-                    ][i],
-                    truncated=batch[Columns.TRUNCATEDS][i]
-                    if Columns.TRUNCATEDS in batch
+                    observations=InfiniteLookbackBuffer(
+                        [
+                            unpack_if_needed(obs_col[i])
+                            if obs_needs_unpack
+                            else obs_col[i],
+                            unpack_if_needed(next_obs_col[i])
+                            if next_obs_needs_unpack
+                            else next_obs_col[i],
+                        ]
+                    ),
+                    infos=InfiniteLookbackBuffer(
+                        [
+                            {},
+                            infos_col[i] if infos_col is not None else {},
+                        ]
+                    ),
+                    actions=InfiniteLookbackBuffer([actions_col[i]]),
+                    rewards=InfiniteLookbackBuffer(
+                        [rewards_col[i]], space=_REWARD_SPACE
+                    ),
+                    terminated=terminateds_col[i],
+                    truncated=truncateds_col[i]
+                    if truncateds_col is not None
                     else False,
                     # TODO (simon): Results in zero-length episodes in connector.
                     # t_started=batch[Columns.T if Columns.T in batch else
                     # "unroll_id"][i][0],
                     # TODO (simon): Single-dimensional columns are not supported.
                     extra_model_outputs={
-                        k: [v[i]] for k, v in batch.items() if k not in SCHEMA
+                        k: InfiniteLookbackBuffer([v[i]]) for k, v in extra_cols
                     },
                     len_lookback_buffer=0,
                 )
@@ -1,12 +1,24 @@
 import functools
-import ray
+import queue
+import threading
 import unittest
 
 from pathlib import Path
 
+import gymnasium as gym
+import numpy as np
+
+import ray
 from ray.rllib.algorithms.algorithm_config import AlgorithmConfig
+from ray.rllib.algorithms.bc import BCConfig
+from ray.rllib.core.columns import Columns
 from ray.rllib.env.single_agent_episode import SingleAgentEpisode
-from ray.rllib.offline.offline_data import OfflineData, OfflinePreLearner
+from ray.rllib.offline.offline_data import (
+    OfflineData,
+    OfflinePreLearner,
+    _cast_obs_columns,
+)
+from ray.rllib.policy.sample_batch import MultiAgentBatch
 
 
 class TestOfflineData(unittest.TestCase):
@@ -63,6 +75,151 @@ class TestOfflineData(unittest.TestCase):
         self.assertTrue("episodes" in batch)
         self.assertTrue(isinstance(batch["episodes"][0], SingleAgentEpisode))
 
+    def test_sample_single_batches(self):
+
+        config = (
+            BCConfig()
+            .environment(env="CartPole-v1")
+            .api_stack(
+                enable_rl_module_and_learner=True,
+                enable_env_runner_and_connector_v2=True,
+            )
+            .learners(num_learners=0)
+            .offline_data(
+                input_=[self.data_path],
+                dataset_prefetch_queue_depth=1,
+            )
+        )
+
+        offline_data = OfflineData(config)
+        offline_data.learner_handles = [
+            config.build_learner(env=gym.make("CartPole-v1"))
+        ]
+
+        # Pull several batches through the background prefetch queue.
+        for _ in range(3):
+            batch = offline_data.sample(num_samples=10)
+            self.assertTrue(isinstance(batch, MultiAgentBatch))
+            self.assertTrue(batch.env_steps() == 10)
+
+    def test_sample_caches_iterator(self):
+
+        config = AlgorithmConfig().offline_data(input_=[self.data_path])
+
+        offline_data = OfflineData(config)
+        offline_data.learner_handles = [None]
+
+        # The pipeline is built once per batch size and then reused ...
+        iterator = offline_data.sample(num_samples=10, return_iterator=True)
+        self.assertTrue(
+            offline_data.sample(num_samples=10, return_iterator=True) is iterator
+        )
+        # ... regardless of `num_shards`, which plays no role in the
+        # single-batch pipeline.
+        self.assertTrue(
+            offline_data.sample(num_samples=10, return_iterator=True, num_shards=0)
+            is iterator
+        )
+        # A different batch size builds (and caches) a new pipeline.
+        self.assertTrue(
+            offline_data.sample(num_samples=5, return_iterator=True) is not iterator
+        )
+
+    def test_prefetch_batches(self):
+
+        config = AlgorithmConfig().offline_data(input_=[self.data_path])
+
+        offline_data = OfflineData(config)
+
+        # The prefetcher must forward batches from any (re-)iterable in order
+        # and start over, once an epoch is exhausted.
+        batches = [{"batch": [i]} for i in range(3)]
+        prefetch_queue = queue.Queue(maxsize=2)
+        threading.Thread(
+            target=offline_data._prefetch_batches,
+            args=(batches, prefetch_queue),
+            daemon=True,
+        ).start()
+
+        received = [prefetch_queue.get() for _ in range(6)]
+        self.assertTrue(received == batches + batches)
+
+    def test_sample_prefetch_error(self):
+
+        config = AlgorithmConfig().offline_data(input_=[self.data_path])
+
+        offline_data = OfflineData(config)
+
+        # Inject a pipeline whose prefetch thread already died with an error:
+        # `sample` must re-raise the error and evict the cache entry (instead
+        # of blocking forever on the dead queue in a next call).
+        prefetch_queue = queue.Queue()
+        prefetch_queue.put(ValueError("prefetch failed"))
+        offline_data._iter_cache[10] = [None, prefetch_queue]
+
+        with self.assertRaises(ValueError):
+            offline_data.sample(num_samples=10)
+        self.assertTrue(len(offline_data._iter_cache) == 0)
+
+    def test_local_shuffle_buffer_config(self):
+
+        config = (
+            BCConfig()
+            .environment(env="CartPole-v1")
+            .api_stack(
+                enable_rl_module_and_learner=True,
+                enable_env_runner_and_connector_v2=True,
+            )
+            .learners(num_learners=0)
+            .offline_data(input_=[self.data_path])
+        )
+        learner = config.build_learner(env=gym.make("CartPole-v1"))
+
+        # Default: no local shuffle buffer. The data is only shuffled once via
+        # the block order at read time, i.e. iteration order is fixed per
+        # epoch.
+        offline_data = OfflineData(config)
+        self.assertTrue(offline_data.local_shuffle_buffer_size is None)
+        offline_data.learner_handles = [learner]
+        batch = offline_data.sample(num_samples=10)
+        self.assertTrue(batch.env_steps() == 10)
+
+        # Opt-in local shuffle buffer for per-epoch row reshuffling.
+        config.offline_data(dataset_local_shuffle_buffer_size=100)
+        offline_data = OfflineData(config)
+        self.assertTrue(offline_data.local_shuffle_buffer_size == 100)
+        offline_data.learner_handles = [learner]
+        batch = offline_data.sample(num_samples=10)
+        self.assertTrue(batch.env_steps() == 10)
+
+    def test_cast_obs_columns(self):
+
+        batch = {
+            Columns.OBS: np.zeros((4, 2), dtype=np.float32),
+            Columns.NEXT_OBS: np.ones((4, 2), dtype=np.float64),
+            Columns.REWARDS: np.ones(4, dtype=np.float32),
+        }
+        casted = _cast_obs_columns(batch, np.dtype(np.float16))
+        # Float observation columns get downcast ...
+        self.assertTrue(casted[Columns.OBS].dtype == np.float16)
+        self.assertTrue(casted[Columns.NEXT_OBS].dtype == np.float16)
+        # ... while non-observation columns pass through unchanged.
+        self.assertTrue(casted[Columns.REWARDS] is batch[Columns.REWARDS])
+
+        # Integer and object (e.g. LZ4-compressed) observation columns are
+        # passed through unchanged as well.
+        batch = {
+            Columns.OBS: np.arange(4, dtype=np.int64),
+            Columns.NEXT_OBS: np.array([b"compressed"] * 4, dtype=object),
+        }
+        casted = _cast_obs_columns(batch, np.dtype(np.float16))
+        self.assertTrue(casted[Columns.OBS] is batch[Columns.OBS])
+        self.assertTrue(casted[Columns.NEXT_OBS] is batch[Columns.NEXT_OBS])
+
+        # Invalid dtypes are rejected already at configuration time.
+        with self.assertRaises(ValueError):
+            AlgorithmConfig().offline_data(dataset_obs_dtype="no-such-dtype")
+
 
 if __name__ == "__main__":
     import sys